@@ -1,5 +1,354 @@
+import asyncio
+import datetime
+import functools
+import importlib.util
+import os
+import re
+import time
+import urllib.parse
+
+import numpy as np
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+  import httpx
+except ImportError:
+  httpx = None
+
+try:
+  import requests_cache
+except ImportError:
+  requests_cache = None
+
+try:
+  from diskcache import Cache
+except ImportError:
+  Cache = None
+
+try:
+  from orjson import loads as _loads
+except ImportError:
+  from json import loads as _loads
+
+_BASE_URL = 'http://ergast.com/api/f1'
+
+# (connect, read) timeouts in seconds for every request made to the Ergast API
+_TIMEOUT = (3.05, 27)
+
+# Transient failures are retried with exponential backoff, by both the session and the batch queries
+_RETRIES = 4
+_BACKOFF = 0.25
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Ergast allows 4 requests per second. Batch queries start their requests at least 1 / _RATE_LIMIT seconds
+# apart, and keep at most _MAX_CONCURRENCY of them in flight.
+_RATE_LIMIT = 4
+_MAX_CONCURRENCY = 4
+
+_CACHE_DIR = os.path.expanduser('~/.pyergast-cache')
+
+# Time-to-live in seconds of cached responses. Queries of the current season
+# change as races are run, those of a past season never do.
+_CURRENT_TTL = 60
+_SEASON_TTL = 3600
+_DEFAULT_TTL = 86400 * 30
+_SEASON_URL = re.compile(r'/(\d{4})(?:/|\.json)')
+
+# The asynchronous client negotiates HTTP/2 when the h2 package is available
+_HTTP2 = importlib.util.find_spec('h2') is not None
+
+# Columns of the raw driver and constructor tables, in the order they are returned
+_DRIVER_COLUMNS = ('driverId', 'permanentNumber', 'code', 'url', 'givenName', 'familyName', 'dateOfBirth', 'nationality')
+_CONSTRUCTOR_COLUMNS = ('constructorId', 'url', 'name', 'nationality')
+
+# Dtypes of the numeric columns of result dataframes. Nullable, as some rows lack a value.
+_NUMERIC_COLS = {
+  'position': 'Int16',
+  'points': 'Float32',
+  'grid': 'Int16',
+  'laps': 'Int16',
+  'wins': 'Int16',
+  'number': 'Int16',
+  'round': 'Int16',
+  'season': 'Int16'
+}
+
+# Low-cardinality text columns of result dataframes, stored as categories
+_CATEGORICAL = ('nationality', 'constructor', 'constructorID', 'status', 'country', 'positionText', 'code')
+
+
+def _new_session():
+  """
+  Builds a requests session with a pooled, retrying adapter so that consecutive
+  queries reuse the same connection to the Ergast API.
+  When requests-cache is installed, the session also keeps an HTTP cache that
+  revalidates stale responses with conditional requests instead of downloading them again.
+  _get_json gives each request the expiry of the disk cache.
+  """
+  if requests_cache is not None:
+    session = requests_cache.CachedSession(
+      os.path.join(_CACHE_DIR, 'http'),
+      backend='sqlite',
+      cache_control=True,
+      expire_after=_DEFAULT_TTL
+    )
+  else:
+    session = requests.Session()
+  # Transient failures are retried with backoff; once retries are exhausted the last
+  # response is returned so that raise_for_status() reports it
+  retries = Retry(
+    total=_RETRIES,
+    backoff_factor=_BACKOFF,
+    status_forcelist=_RETRY_STATUSES,
+    allowed_methods=frozenset(['GET']),
+    raise_on_status=False
+  )
+  adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+  session.mount('http://', adapter)
+  session.mount('https://', adapter)
+  return session
+
+
+_SESSION = _new_session()
+
+# Decoded responses are cached on disk, keyed by URL, when diskcache is installed
+_CACHE = Cache(_CACHE_DIR) if Cache is not None else None
+
+
+def set_session(session):
+  """
+  Replaces the session used to query the Ergast API, e.g. to inject a mock in tests.
+
+  Parameters
+  ----------
+  session: requests.Session
+    Any object exposing a requests-compatible get(url, timeout=...) method.
+  """
+  global _SESSION
+  _SESSION = session
+
+
+def clear_cache():
+  """
+  Empties the on-disk caches of Ergast API responses, the in-memory driver, constructor and circuit lists
+  and the remembered results of the find_* searches.
+  """
+  if _CACHE is not None:
+    _CACHE.clear()
+  if requests_cache is not None and isinstance(_SESSION, requests_cache.CachedSession):
+    _SESSION.cache.clear()
+  _fetch_table_memo.cache_clear()
+  _search_key.cache_clear()
+  _find_ids.cache_clear()
+
+
+def _url(resource, year=None, race=None):
+  """
+  Builds the url of a query of the API, narrowed down to a year or to a race of a year when they are given.
+  """
+  if year and race:
+    return f'{_BASE_URL}/{year}/{race}/{resource}.json?limit=1000'
+  if year:
+    return f'{_BASE_URL}/{year}/{resource}.json?limit=1000'
+  return f'{_BASE_URL}/{resource}.json?limit=1000'
+
+
+def _finalize(df):
+  """
+  Converts the numeric columns of a result dataframe, returned as strings by the API, to compact nullable dtypes
+  and its low-cardinality text columns to categories.
+  """
+  for col, dtype in _NUMERIC_COLS.items():
+    if col in df.columns:
+      df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+  for col in _CATEGORICAL:
+    if col in df.columns:
+      df[col] = df[col].astype('category')
+  return df
+
+
+def _ttl(url):
+  """
+  Picks how long the response of a url may be served from the cache. None means forever.
+  """
+  if '/current' in url:
+    return _CURRENT_TTL
+  season = _SEASON_URL.search(url)
+  if season:
+    return None if int(season.group(1)) < datetime.date.today().year else _SEASON_TTL
+  return _DEFAULT_TTL
+
+
+def _is_empty(data):
+  """
+  Tells whether a decoded response has no records, e.g. the results of a race that has not been run yet.
+  """
+  tables = [table for name, table in data['MRData'].items() if name.endswith('Table')]
+  return any(not value for table in tables for value in table.values() if isinstance(value, list))
+
+
+def _get_json(url, ttl=None):
+  """
+  Returns the decoded JSON response of the Ergast API for url, from the cache when possible.
+
+  Parameters
+  ----------
+  url: str
+    The url to be queried.
+  ttl: int
+    An optional number of seconds to keep the response cached. Defaults to a value based on the url.
+  """
+  if _CACHE is not None:
+    data = _CACHE.get(url)
+    if data is not None:
+      return data
+
+  expire = ttl if ttl is not None else _ttl(url)
+  http_cache = requests_cache is not None and isinstance(_SESSION, requests_cache.CachedSession)
+  if http_cache:
+    # The HTTP cache follows the same expiry as the disk cache
+    r = _SESSION.get(url, timeout=_TIMEOUT, expire_after=requests_cache.NEVER_EXPIRE if expire is None else expire)
+  else:
+    r = _SESSION.get(url, timeout=_TIMEOUT)
+  r.raise_for_status()
+
+  data = _loads(r.content)
+  # Empty responses are not cached, as the records may appear later
+  if _is_empty(data):
+    if http_cache:
+      _SESSION.cache.delete(urls=[url])
+  elif _CACHE is not None:
+    _CACHE.set(url, data, expire=expire)
+  return data
+
+
+def _async_client():
+  """
+  Builds the httpx client used by the asynchronous batch queries. With HTTP/2,
+  concurrent queries are multiplexed over a single connection with compressed headers.
+  """
+  return httpx.AsyncClient(
+    http2=_HTTP2,
+    limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+    timeout=httpx.Timeout(_TIMEOUT[1], connect=_TIMEOUT[0])
+  )
+
+
+def _throttle(rate):
+  """
+  Returns a coroutine function that, awaited before each request, spaces the requests at least 1 / rate seconds apart.
+  """
+  next_start = 0.0
+
+  async def wait():
+    nonlocal next_start
+    now = asyncio.get_running_loop().time()
+    start = max(next_start, now)
+    next_start = start + 1 / rate
+    await asyncio.sleep(start - now)
+
+  return wait
+
+
+async def _aget_json(client, url, throttle=None):
+  """
+  Asynchronous counterpart of _get_json, sharing the same cache.
+
+  Parameters
+  ----------
+  client: httpx.AsyncClient
+    The client used to query the API.
+  url: str
+    The url to be queried.
+  throttle: coroutine function
+    An optional rate limiter awaited before each request, as returned by _throttle. Cache hits skip it.
+  """
+  if _CACHE is not None:
+    data = _CACHE.get(url)
+    if data is not None:
+      return data
+
+  # Transient failures, connection errors and timeouts included, are retried with backoff,
+  # waiting as long as the API asks to on 429
+  for attempt in range(_RETRIES + 1):
+    if throttle is not None:
+      await throttle()
+    try:
+      r = await client.get(url)
+    except httpx.TransportError:
+      if attempt == _RETRIES:
+        raise
+      await asyncio.sleep(_BACKOFF * 2 ** attempt)
+      continue
+    if r.status_code not in _RETRY_STATUSES or attempt == _RETRIES:
+      break
+    retry_after = r.headers.get('Retry-After', '')
+    await asyncio.sleep(float(retry_after) if retry_after.isdigit() else _BACKOFF * 2 ** attempt)
+  r.raise_for_status()
+
+  data = _loads(r.content)
+  if _CACHE is not None and not _is_empty(data):
+    _CACHE.set(url, data, expire=_ttl(url))
+  return data
+
+
+async def _fetch_all(urls, max_concurrency=_MAX_CONCURRENCY):
+  """
+  Queries the API concurrently for all urls, with at most max_concurrency requests in flight and no more
+  than _RATE_LIMIT requests started per second. Returns the decoded responses in the order of urls.
+  """
+  if httpx is None:
+    raise ImportError('Batch queries require httpx')
+
+  semaphore = asyncio.Semaphore(max_concurrency)
+  throttle = _throttle(_RATE_LIMIT)
+  async with _async_client() as client:
+    async def fetch(url):
+      async with semaphore:
+        return await _aget_json(client, url, throttle)
+
+    return await asyncio.gather(*[fetch(url) for url in urls])
+
+
+def _generation(ttl):
+  """
+  Index of the current window of ttl seconds, part of the keys of the in-memory caches so that data that
+  may still change is fetched again as often as the disk cache expires it. None for data that never changes.
+  """
+  return None if ttl is None else int(time.monotonic() // ttl)
+
+
+def _fetch_table(url, table, key):
+  """
+  Fetches the raw list of records of a table of the API, like the list of drivers.
+  Kept in memory so repeated lookups skip the request, for no longer than the TTL of the url.
+  """
+  return _fetch_table_memo(url, table, key, _generation(_ttl(url)))
+
+
+@functools.lru_cache(maxsize=64)
+def _fetch_table_memo(url, table, key, generation):
+  return _get_json(url)['MRData'][table][key]
+
+
+def _get_drivers_raw(year=None, race=None):
+  """
+  Returns the list of drivers queried by get_drivers as a dict of column lists, for internal callers
+  that do not need a dataframe. Drivers without a permanent number or code have None in those columns.
+  """
+  drivers = _fetch_table(_url('drivers', year, race), 'DriverTable', 'Drivers')
+  return _driver_columns(drivers)
+
+
+def _driver_columns(drivers):
+  """
+  Turns a list of driver records of the API into a dict of column lists, with None for missing fields.
+  """
+  return {col: [driver.get(col) for driver in drivers] for col in _DRIVER_COLUMNS}
+
 
 def get_drivers(year=None, race=None):
   """
@@ -32,20 +381,18 @@ def get_drivers(year=None, race=None):
     dateOfBirth: str
     nationality: str
   """
-  if year and race:
-    url = 'http://ergast.com/api/f1/{}/{}/drivers.json?limit=1000'.format(year, race)
-  elif year:
-    url = 'http://ergast.com/api/f1/{}/drivers.json?limit=1000'.format(year)
-  else:
-    url = 'http://ergast.com/api/f1/drivers.json?limit=1000'
+  results = _finalize(pd.DataFrame(_get_drivers_raw(year, race)))
 
-  r = requests.get(url)
+  return results
 
-  assert r.status_code == 200, 'Cannot connect to Ergast API'
-  drivers = r.json()
-  results = pd.DataFrame(drivers['MRData']['DriverTable']['Drivers'])
 
-  return results
+def _get_constructors_raw(year=None, race=None):
+  """
+  Returns the list of constructors queried by get_constructors as a dict of column lists, for internal callers
+  that do not need a dataframe.
+  """
+  constructors = _fetch_table(_url('constructors', year, race), 'ConstructorTable', 'Constructors')
+  return {col: [constructor.get(col) for constructor in constructors] for col in _CONSTRUCTOR_COLUMNS}
 
 
 def get_constructors(year=None, race=None):
@@ -75,18 +422,7 @@ def get_constructors(year=None, race=None):
     name: str
     nationality: str
   """
-  if year and race:
-    url = 'http://ergast.com/api/f1/{}/{}/constructors.json?limit=1000'.format(year, race)
-  elif year:
-    url = 'http://ergast.com/api/f1/{}/constructors.json?limit=1000'.format(year)
-  else:
-    url = 'http://ergast.com/api/f1/constructors.json?limit=1000'
-
-  r = requests.get(url)
-  
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  constructors = r.json()
-  result = pd.DataFrame(constructors['MRData']['ConstructorTable']['Constructors'])
+  result = _finalize(pd.DataFrame(_get_constructors_raw(year, race)))
 
   return result
 
@@ -121,39 +457,52 @@ def get_circuits(year=None, race=None):
     Locality: str
     Country: str
   """
-  if year and race:
-    url = 'http://ergast.com/api/f1/{}/{}/circuits.json?limit=1000'.format(year, race)
-  elif year:
-    url = 'http://ergast.com/api/f1/{}/circuits.json?limit=1000'.format(year)
-  else:
-    url = 'http://ergast.com/api/f1/circuits.json?limit=1000'
-
-  r = requests.get(url)
-  
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  circuits = r.json()
-  result = pd.DataFrame(circuits['MRData']['CircuitTable']['Circuits'])
-
-  # Grabbing latitude, longtitude, locality and country separately
-  geo = result['Location']
-  latitude, longtitude, locality, country = ([] for i in range(4))
-  for track in geo:
-    latitude.append(track['lat'])
-    longtitude.append(track['long'])
-    locality.append(track['locality'])
-    country.append(track['country'])
-  result['Latitude'] = latitude
-  result['Longtitude'] = longtitude
-  result['Locality'] = locality
-  result['Country'] = country
-  result = result.drop('Location', axis=1)
+  # Flattening latitude, longtitude, locality and country out of Location
+  circuits = _fetch_table(_url('circuits', year, race), 'CircuitTable', 'Circuits')
+  result = _finalize(pd.json_normalize(circuits, sep='_').rename(columns={
+    'Location_lat': 'Latitude',
+    'Location_long': 'Longtitude',
+    'Location_locality': 'Locality',
+    'Location_country': 'Country'
+  }))
 
   return result
 
 
+@functools.lru_cache(maxsize=16)
+def _search_key(getter, cols, generation):
+  """
+  Ids and lowercased search key over cols of the full list returned by getter, as numpy string arrays
+  computed once per generation and shared by the find_* searches. The first of cols is the id column.
+  Columns are joined on newlines so that a match cannot span two of them.
+  """
+  table = getter()
+  ids = np.asarray(table[cols[0]], dtype=str)
+  key = ids
+  for col in cols[1:]:
+    key = np.char.add(np.char.add(key, '\n'), np.asarray(table[col], dtype=str))
+  return ids, np.char.lower(key)
+
+
+@functools.lru_cache(maxsize=256)
+def _find_ids(getter, cols, generation, *queries):
+  """
+  Ids of the rows of the full list returned by getter whose search key over cols contains any of
+  the lowercased queries. Cached per query and generation, so repeating a search skips the scan. Ids rather
+  than positions are kept, as they still select the right rows once the list has been fetched again.
+  """
+  ids, key = _search_key(getter, cols, generation)
+  mask = np.zeros(len(key), dtype=bool)
+  for query in queries:
+    mask |= np.char.find(key, query) >= 0
+  return tuple(ids[mask].tolist())
+
+
 def find_driverId(firstname, lastname):
   """
   Searches the list of all drivers to find ones that are the same or similar to that input.
+  A driver whose driverId is the last name and whose first name matches is looked up directly
+  and returned on its own; otherwise all drivers with either name in their driverId are returned.
 
   Parameters
   ----------
@@ -179,10 +528,17 @@ def find_driverId(firstname, lastname):
     dateOfBirth: str
     nationality: str
   """
-  dfDrivers = get_drivers()
-  result = dfDrivers[
-    dfDrivers['driverId'].str.contains(firstname.lower()) | dfDrivers['driverId'].str.contains(lastname.lower())
-  ]
+  # Most driverIds are the driver's last name, which the API can look up without listing every driver
+  if lastname:
+    url = _url('drivers/' + urllib.parse.quote(lastname.lower().replace(' ', '_'), safe=''))
+    drivers = _fetch_table(url, 'DriverTable', 'Drivers')
+    if drivers and drivers[0]['givenName'].lower() == firstname.lower():
+      return _finalize(pd.DataFrame(_driver_columns(drivers[:1])))
+
+  generation = _generation(_ttl(_url('drivers')))
+  ids = _find_ids(_get_drivers_raw, ('driverId',), generation, firstname.lower(), lastname.lower())
+  drivers = get_drivers()
+  result = drivers[drivers['driverId'].isin(ids)].reset_index(drop=True)
 
   return result
 
@@ -209,10 +565,10 @@ def find_constructorid(name):
     name: str
     nationality: str
   """
-  dfConstructors = get_constructors()
-  result = dfConstructors[
-    dfConstructors['constructorId'].str.contains(name.lower())
-  ]
+  generation = _generation(_ttl(_url('constructors')))
+  ids = _find_ids(_get_constructors_raw, ('constructorId',), generation, name.lower())
+  constructors = get_constructors()
+  result = constructors[constructors['constructorId'].isin(ids)].reset_index(drop=True)
 
   return result
 
@@ -242,13 +598,11 @@ def find_circuitid(circuit):
     Locality: str
     Country: str
   """
-  dfCircuits = get_circuits()
-  result = dfCircuits[
-    dfCircuits['circuitId'].str.lower().str.contains(circuit.lower()) |
-    dfCircuits['circuitName'].str.lower().str.contains(circuit.lower()) |
-    dfCircuits['Locality'].str.lower().str.contains(circuit.lower()) |
-    dfCircuits['Country'].str.lower().str.contains(circuit.lower())
-  ]
+  # Search all four columns at once
+  generation = _generation(_ttl(_url('circuits')))
+  ids = _find_ids(get_circuits, ('circuitId', 'circuitName', 'Locality', 'Country'), generation, circuit.lower())
+  circuits = get_circuits()
+  result = circuits[circuits['circuitId'].isin(ids)].reset_index(drop=True)
 
   return result
 
@@ -277,7 +631,7 @@ def get_race_result(year=None, race=None):
     position: int
     positionText: str
     grid: int
-    points: int
+    points: float
     driverID: str
     driver: str
     nationality: str
@@ -289,30 +643,89 @@ def get_race_result(year=None, race=None):
   """
   if year or race:
     assert year and race, 'You must specify both a year and a race'
-    url = 'http://ergast.com/api/f1/{}/{}/results.json?limit=1000'.format(year, race)
+    url = _url('results', year, race)
   else:
-    url = 'http://ergast.com/api/f1/current/last/results.json?limit=1000'
+    url = _url('results', 'current', 'last')
 
-  r = requests.get(url)
-  
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  race_result = r.json()
+  return _race_result_frame(_get_json(url))
+
+
+def _race_result_frame(race_result):
+  """
+  Reformats a race results response of the API into the dataframe returned by get_race_result.
+  """
   result_dict = race_result['MRData']['RaceTable']['Races'][0]['Results']
 
-  # Unpack the lists of dicts in result_dict and reformat the result
-  for driver in result_dict:
-    driver_info = driver['Driver']
-    constructor_info = driver['Constructor']
-    driver['driver'] = driver_info['givenName'] + ' ' + driver_info['familyName']
-    driver['driverID'] = driver_info['driverId']
-    driver['nationality'] = driver_info['nationality']
-    driver['constructor'] = constructor_info['name']
-    driver['constructorID'] = constructor_info['constructorId']
+  driver_info = [driver['Driver'] for driver in result_dict]
+  constructor_info = [driver['Constructor'] for driver in result_dict]
+
+  # Build only the columns that are relevant to the race result
+  return _finalize(pd.DataFrame({
+    'number': [driver['number'] for driver in result_dict],
+    'position': [driver['position'] for driver in result_dict],
+    'positionText': [driver['positionText'] for driver in result_dict],
+    'grid': [driver['grid'] for driver in result_dict],
+    'points': [driver['points'] for driver in result_dict],
+    'driverID': [info['driverId'] for info in driver_info],
+    'driver': [f"{info['givenName']} {info['familyName']}" for info in driver_info],
+    'nationality': [info['nationality'] for info in driver_info],
+    'constructorID': [info['constructorId'] for info in constructor_info],
+    'constructor': [info['name'] for info in constructor_info],
+    'laps': [driver['laps'] for driver in result_dict],
+    'status': [driver['status'] for driver in result_dict],
+    'Time': [driver.get('Time') for driver in result_dict]
+  }))
+
+
+async def get_race_results_batch(year, rounds=None):
+  """
+  Queries the API concurrently to return the race results of several rounds of a year.
+  Requires httpx.
 
-  # Select the columns that are relevant to the race result
-  cols = ['number', 'position', 'positionText', 'grid', 'points', 'driverID', 'driver',
-          'nationality', 'constructorID', 'constructor', 'laps', 'status', 'Time']
-  return pd.DataFrame(result_dict)[cols]
+  Parameters
+  ----------
+  year: int
+    The year to be queried.
+  rounds: list of int
+    An optional list of rounds to be queried. Defaults to every round of the year held so far.
+
+  Returns
+  -------
+  list of pandas.DataFrame
+
+  One dataframe per round with results, in the order of rounds, with the same columns as get_race_result.
+  Rounds that have not been run yet are left out.
+  """
+  if rounds is None:
+    schedule, = await _fetch_all([_url(year)])
+    today = datetime.date.today().isoformat()
+    rounds = [race['round'] for race in schedule['MRData']['RaceTable']['Races'] if race['date'] <= today]
+
+  race_results = await _fetch_all([_url('results', year, race) for race in rounds])
+
+  return [_race_result_frame(race_result) for race_result in race_results
+          if race_result['MRData']['RaceTable']['Races']]
+
+
+def get_race_results_many(year, rounds=None):
+  """
+  Blocking wrapper around get_race_results_batch, for use outside of an event loop.
+
+  Parameters
+  ----------
+  year: int
+    The year to be queried.
+  rounds: list of int
+    An optional list of rounds to be queried. Defaults to every round of the year held so far.
+
+  Returns
+  -------
+  list of pandas.DataFrame
+
+  One dataframe per round with results, in the order of rounds, with the same columns as get_race_result.
+  Rounds that have not been run yet are left out.
+  """
+  return asyncio.run(get_race_results_batch(year, rounds))
 
 
 def get_qualifying_result(year=None, race=None):
@@ -348,36 +761,32 @@ def get_qualifying_result(year=None, race=None):
   """
   if year and race:
     assert year >= 1996, 'Qualifying data only available starting from 1996'
-    url = 'http://ergast.com/api/f1/{}/{}/qualifying.json?limit=1000'.format(year, race)
+    url = _url('qualifying', year, race)
   else:
-    url = 'http://ergast.com/api/f1/current/last/qualifying.json?limit=1000'
-
-  r = requests.get(url)
+    url = _url('qualifying', 'current', 'last')
 
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  race_result = r.json()
+  race_result = _get_json(url)
   result_dict = race_result['MRData']['RaceTable']['Races'][0]['QualifyingResults']
 
-  # Unpack the lists of dicts in result_dict and reformat the result
-  for driver in result_dict:
-    driver_info = driver['Driver']
-    constructor_info = driver['Constructor']
-    driver['driver'] = driver_info['givenName'] + ' ' + driver_info['familyName']
-    driver['driverID'] = driver_info['driverId']
-    driver['nationality'] = driver_info['nationality']
-    driver['constructor'] = driver_info['name']
-    driver['constructorID'] = driver_info['constructorId']
-
-  # Specify the columns to be returned, taking into account chaning qualifying formats
-  cols = [
-    'number', 'position', 'driverID', 'driver', 'nationality', 'constructorID', 'constructor', 'Q1'
-  ]
-  if 'Q2' in result_dict[0].keys():
-    cols.append('Q2')
-  if 'Q3' in result_dict[0].keys():
-    cols.append('Q3')
+  driver_info = [driver['Driver'] for driver in result_dict]
+  constructor_info = [driver['Constructor'] for driver in result_dict]
+
+  data = {
+    'number': [driver['number'] for driver in result_dict],
+    'position': [driver['position'] for driver in result_dict],
+    'driverID': [info['driverId'] for info in driver_info],
+    'driver': [f"{info['givenName']} {info['familyName']}" for info in driver_info],
+    'nationality': [info['nationality'] for info in driver_info],
+    'constructorID': [info['constructorId'] for info in constructor_info],
+    'constructor': [info['name'] for info in constructor_info],
+    'Q1': [driver.get('Q1') for driver in result_dict]
+  }
+  # Add the later sessions, taking into account changing qualifying formats
+  for session in ('Q2', 'Q3'):
+    if session in result_dict[0]:
+      data[session] = [driver.get(session) for driver in result_dict]
 
-  return pd.DataFrame(result_dict)[cols]
+  return _finalize(pd.DataFrame(data))
 
 
 def get_schedule(year=None):
@@ -401,32 +810,29 @@ def get_schedule(year=None):
     round: int
     url: str
     raceName: str
-    date: str
+    date: datetime64
     circuitId: str
     circuitName: str
     locality: str
     country: str
   """
-  if year:
-    url = 'http://ergast.com/api/f1/{}.json?limit=1000'.format(year)
-  else:
-    url = 'http://ergast.com/api/f1/current.json?limit=1000'
-
-  r = requests.get(url)
+  # The schedule is the season itself, without a further resource
+  url = _url(year or 'current')
 
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  schedule = r.json()['MRData']['RaceTable']['Races']
+  schedule = _get_json(url)['MRData']['RaceTable']['Races']
 
-  # Unpack the lists of dicts in result_dict and reformat the result
-  for race in schedule:
-    circuit = race['Circuit']
-    race['circuitID'] = circuit['circuitId']
-    race['circuitName'] = circuit['circuitName']
-    race['locality'] = circuit['Location']['locality']
-    race['country'] = circuit['Location']['country']
-    del race['Circuit']
+  # One fixed-shape record per race, with its circuit flattened into it
+  records = [
+    (race['season'], race['round'], race['url'], race['raceName'], race['date'],
+     race['Circuit']['circuitId'], race['Circuit']['circuitName'],
+     race['Circuit']['Location']['locality'], race['Circuit']['Location']['country'])
+    for race in schedule
+  ]
+  cols = ['season', 'round', 'url', 'raceName', 'date', 'circuitId', 'circuitName', 'locality', 'country']
+  result = pd.DataFrame.from_records(records, columns=cols)
+  result['date'] = pd.to_datetime(result['date'])
 
-  return pd.DataFrame(schedule)
+  return _finalize(result)
 
 
 def driver_standings(year=None, race=None):
@@ -450,7 +856,7 @@ def driver_standings(year=None, race=None):
   Columns:
     position: int
     positionText: str
-    points: int
+    points: float
     wins: int
     driverID: str
     driver: str
@@ -458,28 +864,129 @@ def driver_standings(year=None, race=None):
     constructorID: str
     constructor: str
   """
-  if year and race:
-    url = 'http://ergast.com/api/f1/{}/{}/driverStandings.json?limit=1000'.format(year, race)
-  elif year:
-    url = 'http://ergast.com/api/f1/{}/driverStandings.json?limit=1000'.format(year)
+  if year:
+    url = _url('driverStandings', year, race)
   else:
-    url = 'http://ergast.com/api/f1/current/driverStandings.json?limit=1000'
+    url = _url('driverStandings', 'current')
+
+  return _finalize(_driver_standings_frame(_get_json(url)))
+
+
+def _driver_standings_frame(standings):
+  """
+  Reformats a driver standings response of the API into the dataframe returned by driver_standings,
+  before its dtypes are finalized.
+  """
+  driver_standings = standings['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings']
+  driver_info = [driver['Driver'] for driver in driver_standings]
+  constructor_info = [driver['Constructors'][0] for driver in driver_standings]
+
+  return pd.DataFrame({
+    'position': [driver.get('position') for driver in driver_standings],
+    'positionText': [driver['positionText'] for driver in driver_standings],
+    'points': [driver['points'] for driver in driver_standings],
+    'wins': [driver['wins'] for driver in driver_standings],
+    'driverID': [info['driverId'] for info in driver_info],
+    'driver': [f"{info['givenName']} {info['familyName']}" for info in driver_info],
+    'nationality': [info['nationality'] for info in driver_info],
+    'constructorID': [info['constructorId'] for info in constructor_info],
+    'constructor': [info['name'] for info in constructor_info]
+  })
+
+
+async def driver_standings_batch(years, race=None, max_concurrency=_MAX_CONCURRENCY):
+  """
+  Fetch the driver standings of several years at once, querying the API concurrently.
+  Requires httpx.
+
+  Parameters
+  ----------
+  years: list of int
+    The years to be queried.
+  race: int
+    An optional parameter that specifies the round of each year to be queried. Defaults to the final standings.
+  max_concurrency: int
+    The maximum number of queries in flight at once. Queries are also started no more than 4 per second,
+    the rate limit of the API.
+
+  Returns
+  -------
+  pandas.DataFrame
 
-  r = requests.get(url)
+  Seasons without standings yet are left out, and no seasons give an empty dataframe with these columns.
 
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  driver_standings = r.json()['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings']
+  Index:
+    RangeIndex
+
+  Columns:
+    season: int
+    position: int
+    positionText: str
+    points: float
+    wins: int
+    driverID: str
+    driver: str
+    nationality: str
+    constructorID: str
+    constructor: str
+  """
+  urls = [_url('driverStandings', year, race) for year in years]
+  responses = await _fetch_all(urls, max_concurrency)
 
-  for driver in driver_standings:
-    driver['driverID'] = driver['Driver']['driverId']
-    driver['driver'] = driver['Driver']['givenName'] + ' ' + driver['Driver']['familyName']
-    driver['nationality'] = driver['Driver']['nationality']
-    driver['constructorID'] = driver['Constructors'][0]['constructorId']
-    driver['constructor'] = driver['Constructors'][0]['name']
-    del driver['Driver']
-    del driver['Constructors']
+  frames = []
+  for standings in responses:
+    # Seasons without standings yet, like future ones, are left out
+    if not standings['MRData']['StandingsTable']['StandingsLists']:
+      continue
+    frame = _driver_standings_frame(standings)
+    frame.insert(0, 'season', standings['MRData']['StandingsTable']['StandingsLists'][0]['season'])
+    frames.append(frame)
 
-  return pd.DataFrame(driver_standings)
+  if not frames:
+    cols = ['season', 'position', 'positionText', 'points', 'wins',
+            'driverID', 'driver', 'nationality', 'constructorID', 'constructor']
+    return _finalize(pd.DataFrame(columns=cols, dtype=str))
+
+  # Concatenate before finalizing so that categorical columns share their categories
+  return _finalize(pd.concat(frames, ignore_index=True))
+
+
+def driver_standings_multi(years, race=None, max_concurrency=_MAX_CONCURRENCY):
+  """
+  Blocking wrapper around driver_standings_batch, for use outside of an event loop.
+
+  Parameters
+  ----------
+  years: list of int
+    The years to be queried.
+  race: int
+    An optional parameter that specifies the round of each year to be queried. Defaults to the final standings.
+  max_concurrency: int
+    The maximum number of queries in flight at once. Queries are also started no more than 4 per second,
+    the rate limit of the API.
+
+  Returns
+  -------
+  pandas.DataFrame
+
+  Seasons without standings yet are left out, and no seasons give an empty dataframe with these columns.
+
+  Index:
+    RangeIndex
+
+  Columns:
+    season: int
+    position: int
+    positionText: str
+    points: float
+    wins: int
+    driverID: str
+    driver: str
+    nationality: str
+    constructorID: str
+    constructor: str
+  """
+  return asyncio.run(driver_standings_batch(years, race, max_concurrency))
 
 
 def constructor_standings(year=None, race=None):
@@ -503,33 +1010,30 @@ def constructor_standings(year=None, race=None):
   Columns:
     position: int
     positionText: str
-    points: int
+    points: float
     wins: int
     constructorID: str
     constructor: str
     nationality: str
   """
-  if year and race:
-    assert year >= 1958, 'Constructor standings only available starting 1958'
-    url = 'http://ergast.com/api/f1/{}/{}/constructorStandings.json?limit=1000'.format(year, race)
-  elif year:
+  if year:
     assert year >= 1958, 'Constructor standings only available starting 1958'
-    url = 'http://ergast.com/api/f1/{}/constructorStandings.json?limit=1000'.format(year)
+    url = _url('constructorStandings', year, race)
   else:
-    url = 'http://ergast.com/api/f1/current/constructorStandings.json?limit=1000'
-
-  r = requests.get(url)
-
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs'
-  constructor_standings = r.json()['MRData']['StandingsTable']['StandingsLists'][0]['ConstructorStandings']
+    url = _url('constructorStandings', 'current')
 
-  for constructor in constructor_standings:
-    constructor['constructorID'] = constructor['Constructor']['constructorId']
-    constructor['name'] = constructor['Constructor']['name']
-    constructor['nationality'] = constructor['Constructor']['nationality']
-    del constructor['Constructor']
+  constructor_standings = _get_json(url)['MRData']['StandingsTable']['StandingsLists'][0]['ConstructorStandings']
+  constructor_info = [constructor['Constructor'] for constructor in constructor_standings]
 
-  return pd.DataFrame(constructor_standings)
+  return _finalize(pd.DataFrame({
+    'position': [constructor.get('position') for constructor in constructor_standings],
+    'positionText': [constructor['positionText'] for constructor in constructor_standings],
+    'points': [constructor['points'] for constructor in constructor_standings],
+    'wins': [constructor['wins'] for constructor in constructor_standings],
+    'constructorID': [info['constructorId'] for info in constructor_info],
+    'name': [info['name'] for info in constructor_info],
+    'nationality': [info['nationality'] for info in constructor_info]
+  }))
 
 
 def query_driver(driverid):
@@ -553,32 +1057,38 @@ def query_driver(driverid):
     round: int
     position: int
     positionText: str
-    points: int
+    points: float
     wins: int
     driver: str
     nationality: str
     constructorID: str
     constructor: str
   """
-  url = 'http://ergast.com/api/f1/drivers/{}/driverStandings.json?limit=1000'.format(driverid)
-  r = requests.get(url)
-
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  seasons = r.json()['MRData']['StandingsTable']['StandingsLists']
-
-  # Extracting data from json
-  for season in seasons:
-    for key, value in season['DriverStandings'][0].items():
-      season[key] = value
-    season['driver'] = season['Driver']['givenName'] + ' ' + season['Driver']['familyName']
-    season['nationality'] = season['Driver']['nationality']
-    season['constructorID'] = season['Constructors'][0]['constructorId']
-    season['constructor'] = season['Constructors'][0]['name']
-    del season['DriverStandings']
-    del season['Driver']
-    del season['Constructors']
-
-  return pd.DataFrame(seasons)
+  url = _url(f"drivers/{urllib.parse.quote(driverid, safe='')}/driverStandings")
+  seasons = _get_json(url)['MRData']['StandingsTable']['StandingsLists']
+
+  # Extracting data from json, one row per season
+  def rows():
+    for season in seasons:
+      standing = season['DriverStandings'][0]
+      driver = standing['Driver']
+      constructor = standing['Constructors'][0]
+      yield {
+        'season': season['season'],
+        'round': season['round'],
+        'position': standing.get('position'),
+        'positionText': standing['positionText'],
+        'points': standing['points'],
+        'wins': standing['wins'],
+        'driver': f"{driver['givenName']} {driver['familyName']}",
+        'nationality': driver['nationality'],
+        'constructorID': constructor['constructorId'],
+        'constructor': constructor['name']
+      }
+
+  cols = ['season', 'round', 'position', 'positionText', 'points', 'wins',
+          'driver', 'nationality', 'constructorID', 'constructor']
+  return _finalize(pd.DataFrame(rows(), columns=cols))
 
 
 def query_constructor(constructorid):
@@ -602,26 +1112,32 @@ def query_constructor(constructorid):
     round: int
     position: int
     positionText: str
-    points: int
+    points: float
     wins: int
     constructorID: str
     constructor: str
     nationality: str
   """
-  url = 'http://ergast.com/api/f1/constructors/{}/constructorStandings.json?limit=1000'.format(constructorid)
-  r = requests.get(url)
-
-  assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-  seasons = r.json()['MRData']['StandingsTable']['StandingsLists']
-
-  # Extracting data from json
-  for season in seasons:
-    for key, value in season['ConstructorStandings'][0].items():
-      season[key] = value
-    season['constructorID'] = season['Constructor']['constructorId']
-    season['constructor'] = season['Constructor']['name']
-    season['nationality'] = season['Constructor']['nationality']
-    del season['Constructor']
-    del season['ConstructorStandings']
-
-  return pd.DataFrame(seasons)
+  url = _url(f"constructors/{urllib.parse.quote(constructorid, safe='')}/constructorStandings")
+  seasons = _get_json(url)['MRData']['StandingsTable']['StandingsLists']
+
+  # Extracting data from json, one row per season
+  def rows():
+    for season in seasons:
+      standing = season['ConstructorStandings'][0]
+      constructor = standing['Constructor']
+      yield {
+        'season': season['season'],
+        'round': season['round'],
+        'position': standing.get('position'),
+        'positionText': standing['positionText'],
+        'points': standing['points'],
+        'wins': standing['wins'],
+        'constructorID': constructor['constructorId'],
+        'constructor': constructor['name'],
+        'nationality': constructor['nationality']
+      }
+
+  cols = ['season', 'round', 'position', 'positionText', 'points', 'wins',
+          'constructorID', 'constructor', 'nationality']
+  return _finalize(pd.DataFrame(rows(), columns=cols))
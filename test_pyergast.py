@@ -1,3 +1,13 @@
+import datetime
+import io
+import json
+import time
+import types
+
+import pytest
+import urllib3
+from requests.adapters import HTTPAdapter
+
 from pyergast import __version__
 from pyergast import pyergast
 
@@ -16,3 +26,392 @@ def test_get_constructors():
   actual_constructors = pyergast.get_constructors(2021)['constructorId'].count()
   assert actual_constructors == expected_constructors, 'Should be true (10 constructors)'
 
+
+# Offline tests. The Ergast API is replaced by canned responses keyed by url, served through
+# set_session for the blocking queries and an httpx.MockTransport for the batch queries.
+
+_YEAR = datetime.date.today().year
+
+_DRIVERS = [
+  {'driverId': 'hamilton', 'permanentNumber': '44', 'code': 'HAM', 'url': 'http://a', 'givenName': 'Lewis',
+   'familyName': 'Hamilton', 'dateOfBirth': '1985-01-07', 'nationality': 'British'},
+  {'driverId': 'antonelli', 'permanentNumber': '12', 'code': 'ANT', 'url': 'http://b', 'givenName': 'Andrea Kimi',
+   'familyName': 'Antonelli', 'dateOfBirth': '2006-08-25', 'nationality': 'Italian'},
+  {'driverId': 'hill', 'url': 'http://c', 'givenName': 'Graham',
+   'familyName': 'Hill', 'dateOfBirth': '1929-02-15', 'nationality': 'British'}
+]
+
+
+def _drivers(drivers):
+  return {'MRData': {'DriverTable': {'Drivers': drivers}}}
+
+
+def _race(season, race, date):
+  return {'season': str(season), 'round': str(race), 'url': 'http://r', 'raceName': 'Grand Prix', 'date': date,
+          'Circuit': {'circuitId': 'monza', 'circuitName': 'Monza', 'url': 'http://m',
+                      'Location': {'lat': '45.6', 'long': '9.2', 'locality': 'Monza', 'country': 'Italy'}}}
+
+
+def _results(season, race):
+  result = {'number': '44', 'position': '1', 'positionText': '1', 'points': '25', 'grid': '2', 'laps': '53',
+            'status': 'Finished', 'Driver': _DRIVERS[0], 'Constructor': {'constructorId': 'ferrari', 'name': 'Ferrari'},
+            'Time': {'time': '1:20:00.000'}}
+  return {'MRData': {'RaceTable': {'season': str(season), 'round': str(race),
+                                   'Races': [dict(_race(season, race, '2021-01-01'), Results=[result])]}}}
+
+
+_EMPTY_RACES = {'MRData': {'RaceTable': {'Races': []}}}
+
+
+class FakeResponse:
+  def __init__(self, data):
+    self.status_code = 200
+    self.content = json.dumps(data).encode()
+
+  def raise_for_status(self):
+    pass
+
+
+class FakeSession:
+  """
+  Serves canned responses by url and records the urls it was asked for.
+  """
+  def __init__(self, responses):
+    self.responses = responses
+    self.calls = []
+
+  def get(self, url, timeout=None):
+    self.calls.append(url)
+    return FakeResponse(self.responses[url])
+
+
+@pytest.fixture
+def offline(monkeypatch):
+  """
+  Runs a test against a fake session, without disk cache and with empty in-memory caches.
+  """
+  session = FakeSession({})
+  previous = pyergast._SESSION
+  monkeypatch.setattr(pyergast, '_CACHE', None)
+  pyergast.set_session(session)
+  _clear_memory()
+  yield session
+  pyergast.set_session(previous)
+  _clear_memory()
+
+
+def _clear_memory():
+  # clear_cache would also empty the real on-disk caches
+  for cached in (pyergast._fetch_table_memo, pyergast._search_key, pyergast._find_ids):
+    cached.cache_clear()
+
+
+@pytest.fixture
+def disk_cache(offline, monkeypatch, tmp_path):
+  """
+  Adds a disk cache in a temporary directory to the offline setup.
+  """
+  diskcache = pytest.importorskip('diskcache')
+  cache = diskcache.Cache(str(tmp_path))
+  monkeypatch.setattr(pyergast, '_CACHE', cache)
+  yield cache
+  cache.close()
+
+
+def test_ttl():
+  assert pyergast._ttl(pyergast._url('results', 2021, 5)) is None, 'Should be true (past rounds never change)'
+  assert pyergast._ttl(pyergast._url(2021)) is None, 'Should be true (past seasons never change)'
+  assert pyergast._ttl(pyergast._url('results', _YEAR, 22)) == pyergast._SEASON_TTL
+  assert pyergast._ttl(pyergast._url('driverStandings', _YEAR + 1)) == pyergast._SEASON_TTL
+  assert pyergast._ttl(pyergast._url('results', 'current', 'last')) == pyergast._CURRENT_TTL
+  assert pyergast._ttl(pyergast._url('drivers')) == pyergast._DEFAULT_TTL
+
+
+def test_disk_cache_hit_and_miss(offline, disk_cache):
+  url = pyergast._url('drivers', 2021)
+  offline.responses[url] = _drivers(_DRIVERS)
+  pyergast._get_json(url)
+  pyergast._get_json(url)
+  assert offline.calls == [url], 'Should be true (second query served from the cache)'
+
+  other = pyergast._url('drivers', 2020)
+  offline.responses[other] = _drivers(_DRIVERS[:1])
+  assert pyergast._get_json(other)['MRData']['DriverTable']['Drivers'] == _DRIVERS[:1]
+  assert offline.calls == [url, other]
+
+
+def test_disk_cache_expiry(offline, disk_cache):
+  past = pyergast._url('results', 2021, 5)
+  current = pyergast._url('results', _YEAR, 1)
+  offline.responses[past] = _results(2021, 5)
+  offline.responses[current] = _results(_YEAR, 1)
+  pyergast._get_json(past)
+  pyergast._get_json(current)
+  assert disk_cache.get(past, expire_time=True)[1] is None, 'Should be true (past rounds are kept forever)'
+  assert disk_cache.get(current, expire_time=True)[1] is not None, 'Should be true (current rounds expire)'
+
+  url = pyergast._url('drivers')
+  offline.responses[url] = _drivers(_DRIVERS)
+  pyergast._get_json(url, ttl=0.05)
+  time.sleep(0.1)
+  pyergast._get_json(url)
+  assert offline.calls.count(url) == 2, 'Should be true (expired response queried again)'
+
+
+def test_empty_round_not_cached(offline, disk_cache):
+  url = pyergast._url('results', _YEAR, 22)
+  offline.responses[url] = _EMPTY_RACES
+  with pytest.raises(IndexError):
+    pyergast.get_race_result(_YEAR, 22)
+  assert url not in disk_cache, 'Should be true (empty responses are not cached)'
+
+  offline.responses[url] = _results(_YEAR, 22)
+  assert pyergast.get_race_result(_YEAR, 22)['driverID'].tolist() == ['hamilton'], 'Should be true (result once run)'
+
+
+def test_fetch_table_expires_current_season(offline, monkeypatch):
+  clock = [0.0]
+  monkeypatch.setattr(pyergast, 'time', types.SimpleNamespace(monotonic=lambda: clock[0]))
+  current = pyergast._url('drivers', _YEAR)
+  past = pyergast._url('drivers', 2021)
+  offline.responses[current] = offline.responses[past] = _drivers(_DRIVERS)
+  pyergast.get_drivers(_YEAR)
+  pyergast.get_drivers(2021)
+  pyergast.get_drivers(_YEAR)
+  assert offline.calls == [current, past], 'Should be true (lists kept in memory)'
+
+  clock[0] += pyergast._SEASON_TTL
+  pyergast.get_drivers(_YEAR)
+  pyergast.get_drivers(2021)
+  assert offline.calls == [current, past, current], 'Should be true (only the current season fetched again)'
+
+
+def _mock_client(monkeypatch, handler):
+  """
+  Points the batch queries at an httpx.MockTransport calling handler, and returns the list of requested urls.
+  """
+  httpx = pytest.importorskip('httpx')
+  # Tests of the rate limit set it back themselves
+  monkeypatch.setattr(pyergast, '_RATE_LIMIT', 1000)
+  calls = []
+
+  def record(request):
+    calls.append(str(request.url))
+    return handler(request)
+
+  monkeypatch.setattr(pyergast, '_async_client', lambda: httpx.AsyncClient(transport=httpx.MockTransport(record)))
+  return calls
+
+
+def _serve(responses):
+  """
+  MockTransport handler serving canned responses by url.
+  """
+  return lambda request: pyergast.httpx.Response(200, json=responses[str(request.url)])
+
+
+def test_get_race_results_many(offline, monkeypatch):
+  responses = {pyergast._url('results', 2021, race): _results(2021, race) for race in (1, 2)}
+  calls = _mock_client(monkeypatch, _serve(responses))
+  results = pyergast.get_race_results_many(2021, [1, 2])
+  assert len(results) == 2, 'Should be true (one result per round)'
+  assert results[1]['driverID'].tolist() == ['hamilton']
+  assert sorted(calls) == sorted(responses), 'Should be true (one request per round)'
+
+
+def test_get_race_results_many_skips_unrun_rounds(offline, monkeypatch):
+  schedule = {'MRData': {'RaceTable': {'Races': [
+    _race(_YEAR, 1, '2000-01-01'), _race(_YEAR, 2, '2000-01-08'), _race(_YEAR, 3, '9999-12-31')
+  ]}}}
+  responses = {pyergast._url(_YEAR): schedule}
+  for race in (1, 2):
+    responses[pyergast._url('results', _YEAR, race)] = _results(_YEAR, race)
+  responses[pyergast._url('results', _YEAR, 3)] = _EMPTY_RACES
+  calls = _mock_client(monkeypatch, _serve(responses))
+
+  results = pyergast.get_race_results_many(_YEAR)
+  assert len(results) == 2, 'Should be true (only rounds held so far)'
+  assert pyergast._url('results', _YEAR, 3) not in calls, 'Should be true (future round not queried)'
+
+  results = pyergast.get_race_results_many(_YEAR, [1, 3])
+  assert len(results) == 1, 'Should be true (empty round left out)'
+
+
+class FakeAdapter(HTTPAdapter):
+  """
+  Transport adapter serving canned responses by url, so that a real requests-cache session can be tested.
+  """
+  def __init__(self, responses):
+    super().__init__()
+    self.responses = responses
+    self.calls = []
+
+  def send(self, request, **kwargs):
+    self.calls.append(request.url)
+    body = io.BytesIO(json.dumps(self.responses[request.url]).encode())
+    return self.build_response(request, urllib3.HTTPResponse(body=body, status=200, preload_content=False))
+
+
+def test_http_cache_expiry(offline):
+  requests_cache = pytest.importorskip('requests_cache')
+  session = requests_cache.CachedSession(backend='memory', cache_control=True)
+  past = pyergast._url('results', 2021, 5)
+  current = pyergast._url('results', _YEAR, 1)
+  empty = pyergast._url('results', _YEAR, 22)
+  adapter = FakeAdapter({past: _results(2021, 5), current: _results(_YEAR, 1), empty: _EMPTY_RACES})
+  session.mount('http://', adapter)
+  pyergast.set_session(session)
+
+  for url in (past, current, empty, past, current, empty):
+    pyergast._get_json(url)
+  assert adapter.calls == [past, current, empty, empty], 'Should be true (empty responses are not cached)'
+  assert session.get(past).expires is None, 'Should be true (past rounds are kept forever)'
+  assert session.get(current).expires is not None, 'Should be true (current rounds expire)'
+
+
+def test_find_driverId(offline):
+  offline.responses[pyergast._url('drivers/hill')] = _drivers([])
+  offline.responses[pyergast._url('drivers')] = _drivers(_DRIVERS)
+  actual_drivers = list(pyergast.find_driverId('Damon', 'Hill')['driverId'])
+  assert actual_drivers == ['hill'], 'Should be true (found in the full list)'
+
+
+def test_find_driverId_direct_lookup(offline):
+  offline.responses[pyergast._url('drivers/hamilton')] = _drivers(_DRIVERS[:1])
+  drivers = pyergast.find_driverId('Lewis', 'Hamilton')
+  assert list(drivers['driverId']) == ['hamilton'], 'Should be true (exact match only)'
+  assert list(drivers.columns) == list(pyergast._DRIVER_COLUMNS), 'Should be true (same columns as get_drivers)'
+  assert list(drivers.index) == [0]
+  pyergast.find_driverId('Lewis', 'Hamilton')
+  assert len(offline.calls) == 1, 'Should be true (lookup kept in memory)'
+
+
+def test_finalize_numeric_dtypes():
+  df = pyergast._finalize(pyergast.pd.DataFrame({'position': ['1', '2', None], 'points': ['25', '18.5', '0']}))
+  assert str(df['position'].dtype) == 'Int16'
+  assert df['position'].isna().tolist() == [False, False, True], 'Should be true (missing positions stay missing)'
+  assert str(df['points'].dtype) == 'Float32'
+  assert df['points'].tolist() == [25, 18.5, 0]
+
+
+def test_finalize_categories():
+  df = pyergast._finalize(pyergast.pd.DataFrame({'status': ['Finished', 'Finished', '+1 Lap'], 'driver': ['a', 'b', 'c']}))
+  assert str(df['status'].dtype) == 'category'
+  assert list(df['status'].cat.categories) == ['+1 Lap', 'Finished']
+  assert str(df['driver'].dtype) != 'category', 'Should be true (other text columns stay strings)'
+
+
+def test_url():
+  assert pyergast._url('drivers') == 'http://ergast.com/api/f1/drivers.json?limit=1000'
+  assert pyergast._url('drivers', 2021) == 'http://ergast.com/api/f1/2021/drivers.json?limit=1000'
+  assert pyergast._url('results', 2021, 5) == 'http://ergast.com/api/f1/2021/5/results.json?limit=1000'
+  assert pyergast._url(2021) == 'http://ergast.com/api/f1/2021.json?limit=1000'
+
+
+def test_query_driver_quotes_id(offline):
+  url = pyergast._url('drivers/a%2F..%3Fb/driverStandings')
+  offline.responses[url] = {'MRData': {'StandingsTable': {'StandingsLists': []}}}
+  assert pyergast.query_driver('a/..?b').empty
+  assert offline.calls == [url], 'Should be true (the id stays one path segment)'
+
+
+def test_batch_rate_limit(offline, monkeypatch):
+  urls = [pyergast._url('drivers', year) for year in (2019, 2020, 2021)]
+  starts = []
+
+  def handler(request):
+    starts.append(time.monotonic())
+    return pyergast.httpx.Response(200, json=_drivers(_DRIVERS))
+
+  _mock_client(monkeypatch, handler)
+  monkeypatch.setattr(pyergast, '_RATE_LIMIT', 4)
+  pyergast.asyncio.run(pyergast._fetch_all(urls))
+  gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+  assert min(gaps) >= 0.24, 'Should be true (no more than 4 requests per second)'
+
+
+def test_batch_retries(offline, monkeypatch):
+  monkeypatch.setattr(pyergast, '_BACKOFF', 0)
+  failures = {'429': 1, '503': 2, 'connect': 1}
+
+  def handler(request):
+    failure = request.url.params.get('fail')
+    if failures.get(failure):
+      failures[failure] -= 1
+      if failure == 'connect':
+        raise pyergast.httpx.ConnectError('connection refused', request=request)
+      return pyergast.httpx.Response(int(failure), headers={'Retry-After': '0'} if failure == '429' else {})
+    return pyergast.httpx.Response(200, json=_drivers(_DRIVERS))
+
+  calls = _mock_client(monkeypatch, handler)
+  urls = [pyergast._url('drivers') + '&fail=' + failure for failure in failures]
+  responses = pyergast.asyncio.run(pyergast._fetch_all(urls))
+  assert [len(r['MRData']['DriverTable']['Drivers']) for r in responses] == [3, 3, 3]
+  assert len(calls) == 7, 'Should be true (one retry after 429, two after 503, one after a connection error)'
+
+  failures['503'] = pyergast._RETRIES + 1
+  with pytest.raises(pyergast.httpx.HTTPStatusError):
+    pyergast.asyncio.run(pyergast._fetch_all(urls[1:2]))
+  failures['connect'] = pyergast._RETRIES + 1
+  with pytest.raises(pyergast.httpx.ConnectError):
+    pyergast.asyncio.run(pyergast._fetch_all(urls[2:]))
+
+
+def _standings(season):
+  standing = {'position': '1', 'positionText': '1', 'points': '387.5', 'wins': '10', 'Driver': _DRIVERS[0],
+              'Constructors': [{'constructorId': 'mercedes', 'name': 'Mercedes'}]}
+  return {'MRData': {'StandingsTable': {'season': str(season),
+                                        'StandingsLists': [{'season': str(season), 'DriverStandings': [standing]}]}}}
+
+
+def test_driver_standings_multi(offline, monkeypatch):
+  responses = {pyergast._url('driverStandings', year): _standings(year) for year in (2020, 2021)}
+  _mock_client(monkeypatch, _serve(responses))
+  standings = pyergast.driver_standings_multi([2020, 2021])
+  assert list(standings['season'].unique()) == [2020, 2021], 'Should be true (one block per season)'
+
+
+def test_driver_standings_batch_in_running_loop(offline, monkeypatch):
+  responses = {pyergast._url('driverStandings', year): _standings(year) for year in (2020, 2021)}
+  _mock_client(monkeypatch, _serve(responses))
+
+  async def explore():
+    # As from a notebook, where an event loop is already running
+    return await pyergast.driver_standings_batch([2020, 2021])
+
+  standings = pyergast.asyncio.run(explore())
+  assert standings['driverID'].tolist() == ['hamilton', 'hamilton']
+
+
+def test_driver_standings_multi_skips_empty_seasons(offline, monkeypatch):
+  responses = {pyergast._url('driverStandings', 2021): _standings(2021),
+               pyergast._url('driverStandings', 2030): {'MRData': {'StandingsTable': {'StandingsLists': []}}}}
+  _mock_client(monkeypatch, _serve(responses))
+  standings = pyergast.driver_standings_multi([2021, 2030])
+  assert standings['season'].tolist() == [2021], 'Should be true (future season left out)'
+
+  empty = pyergast.driver_standings_multi([])
+  assert empty.empty and list(empty.columns) == list(standings.columns), 'Should be true (empty with the same columns)'
+  assert empty.dtypes.astype(str).tolist() == standings.dtypes.astype(str).tolist()
+
+
+def test_find_driverId_memo_survives_refetch(offline):
+  offline.responses[pyergast._url('drivers/hamilton')] = _drivers([])
+  offline.responses[pyergast._url('drivers')] = _drivers(_DRIVERS)
+  assert list(pyergast.find_driverId('Lewis', 'Hamilton')['driverId']) == ['hamilton']
+
+  # The list of drivers is evicted and comes back in another order, while the memo is kept
+  offline.responses[pyergast._url('drivers')] = _drivers(_DRIVERS[::-1])
+  pyergast._fetch_table_memo.cache_clear()
+  actual_drivers = list(pyergast.find_driverId('Lewis', 'Hamilton')['driverId'])
+  assert actual_drivers == ['hamilton'], 'Should be true (memo selects by id, not position)'
+
+
+def test_find_constructorid_index(offline):
+  offline.responses[pyergast._url('constructors')] = {'MRData': {'ConstructorTable': {'Constructors': [
+    {'constructorId': 'mclaren', 'url': 'http://a', 'name': 'McLaren', 'nationality': 'British'},
+    {'constructorId': 'ferrari', 'url': 'http://b', 'name': 'Ferrari', 'nationality': 'Italian'}
+  ]}}}
+  constructors = pyergast.find_constructorid('Ferrari')
+  assert constructors['constructorId'].tolist() == ['ferrari']
+  assert list(constructors.index) == [0], 'Should be true (RangeIndex as documented)'